@@ -1,7 +1,7 @@
 from ._version import version as VERSION  # noqa
 
 from .base import Node
-from .context import ActiveContext, ValidContext, OverrideParam
+from .context import ActiveContext, ValidContext, OverrideParam, BatchGraphUpdates
 from .decorators import forward
 from .module import Module
 from .param import Param
@@ -31,6 +31,7 @@ __all__ = (
     "ActiveContext",
     "ValidContext",
     "OverrideParam",
+    "BatchGraphUpdates",
     "forward",
     "test",
     "CaskadeException",
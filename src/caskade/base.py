@@ -1,4 +1,6 @@
 from typing import Optional, Union
+from contextlib import contextmanager
+from types import MappingProxyType
 
 from .errors import GraphError, NodeConfigurationError
 
@@ -28,7 +30,25 @@ class Node(object):
        n1.unlink("subnode") # alternately n1.unlink(n2) to unlink by object
     """
 
-    graphviz_types = {"node": {"style": "solid", "color": "black", "shape": "circle"}}
+    __slots__ = (
+        "_name",
+        "_children",
+        "_parents",
+        "_active",
+        "_type",
+        "_graph_update_depth",
+        "__weakref__",
+    )
+
+    # Shared state for ``BatchGraphUpdates``, nodes waiting for a deferred
+    # ``update_graph`` call are kept in a dict used as an ordered set
+    _graph_batch_depth = 0
+    _graph_flushing = False
+    _pending_graph_updates = {}
+
+    graphviz_types = MappingProxyType(
+        {"node": MappingProxyType({"style": "solid", "color": "black", "shape": "circle"})}
+    )
 
     def __init__(self, name: Optional[str] = None):
         if name is None:
@@ -42,6 +62,7 @@ class Node(object):
         self._parents = set()
         self._active = False
         self._type = "node"
+        self._graph_update_depth = 0
 
     @property
     def name(self) -> str:
@@ -55,12 +76,12 @@ class Node(object):
     def parents(self) -> set:
         return self._parents
 
-    def link(self, key: Union[str, "Node"], child: Optional["Node"] = None):
+    def link(self, key: Union[str, int, "Node"], child: Optional["Node"] = None):
         """Link the current ``Node`` object to another ``Node`` object as a child.
 
         Parameters
         ----------
-        key: (Union[str, Node])
+        key: (Union[str, int, Node])
             The key to link the child node with.
         child: (Optional[Node], optional)
             The child ``Node`` object to link to. Defaults to None in which
@@ -99,7 +120,7 @@ class Node(object):
         child._parents.add(self)
         self.update_graph()
 
-    def unlink(self, key: Union[str, "Node"]):
+    def unlink(self, key: Union[str, int, "Node"]):
         """Unlink the current ``Node`` object from another ``Node`` object which is a child."""
         if isinstance(key, Node):
             for node in self.children:
@@ -113,11 +134,11 @@ class Node(object):
 
     def topological_ordering(self, with_type: Optional[str] = None) -> tuple["Node"]:
         """Return a topological ordering of the graph below the current node."""
-        ordering = [self]
+        # dict keeps insertion order and gives constant time membership checks
+        ordering = {self: None}
         for node in self.children.values():
             for subnode in node.topological_ordering():
-                if subnode not in ordering:
-                    ordering.append(subnode)
+                ordering.setdefault(subnode)
         if with_type is None:
             return tuple(ordering)
         return tuple(filter(lambda n: n._type == with_type, ordering))
@@ -126,9 +147,64 @@ class Node(object):
         """Triggers a call to all parents that the graph below them has been
         updated. The base ``Node`` object does nothing with this information, but
         other node types may use this to update internal state."""
+        # While flushing a batch the parents are queued to be updated anyway
+        if self._defer_graph_update() or Node._graph_flushing:
+            return
         for parent in self.parents:
             parent.update_graph()
 
+    def _defer_graph_update(self) -> bool:
+        """Check if an ``update_graph`` call on this node should be skipped
+        for now. Inside a ``BatchGraphUpdates`` context the node and all its
+        ancestors are queued to be updated once the context exits."""
+        if self._graph_update_depth > 0:
+            return True
+        if Node._graph_batch_depth == 0:
+            return False
+        if self not in Node._pending_graph_updates:
+            Node._pending_graph_updates[self] = None
+            for parent in self._parents:
+                parent._defer_graph_update()
+        return True
+
+    @staticmethod
+    def _flush_graph_updates():
+        """Run the queued ``update_graph`` calls, children before parents, so
+        that each queued node is updated exactly once."""
+        pending = Node._pending_graph_updates
+        Node._pending_graph_updates = {}
+        ordering = {}
+
+        def visit(node):
+            if node in ordering:
+                return
+            for child in node._children.values():
+                if child in pending:
+                    visit(child)
+            ordering[node] = None
+
+        for node in pending:
+            visit(node)
+
+        Node._graph_flushing = True
+        try:
+            for node in ordering:
+                node.update_graph()
+        finally:
+            Node._graph_flushing = False
+
+    @contextmanager
+    def _batch_graph_update(self):
+        """Defer ``update_graph`` calls on this node until the block exits,
+        then update once. May be nested."""
+        self._graph_update_depth += 1
+        try:
+            yield
+        finally:
+            self._graph_update_depth -= 1
+            if self._graph_update_depth == 0:
+                self.update_graph()
+
     @property
     def active(self) -> bool:
         return self._active
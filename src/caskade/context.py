@@ -1,3 +1,6 @@
+from operator import attrgetter
+
+from .base import Node
 from .module import Module
 from .param import Param
 
@@ -15,7 +18,7 @@ class ActiveContext:
     def __enter__(self):
         self.outer_active = self.module.active
         if self.outer_active and not self.active:
-            self.outer_params = list(p.value for p in self.module.dynamic_params)
+            self.outer_params = list(map(attrgetter("value"), self.module.dynamic_params))
             self.module.clear_params()
         self.module.active = self.active
 
@@ -58,7 +61,7 @@ class OverrideParam:
         # Recursively collect the old values for any pointer affected by the override
         old_values = [(param, param._value)]
         for node in param.parents:
-            if isinstance(node, Param) and node.pointer:
+            if isinstance(node, Param) and node._pointer:
                 old_values += OverrideParam._collect_old_values(node)
                 node._value = None
         return old_values
@@ -73,3 +76,23 @@ class OverrideParam:
         # Reset the param and pointer values as they were before the override
         for node, value in self.old_values:
             node._value = value
+
+
+class BatchGraphUpdates:
+    """
+    Context manager to defer graph updates. Inside a BatchGraphUpdates the
+    ``update_graph`` calls made when linking nodes or setting ``Param`` values
+    are queued, on exit each affected node is updated once. Use this when
+    building or reconfiguring a large graph to avoid rebuilding the parameter
+    tuples of every ``Module`` above each change. Inside the block the
+    ``dynamic_params`` of a ``Module`` are not yet updated, so filling params
+    (and so calling a top level ``@forward`` method) raises a ``GraphError``.
+    """
+
+    def __enter__(self):
+        Node._graph_batch_depth += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        Node._graph_batch_depth -= 1
+        if Node._graph_batch_depth == 0:
+            Node._flush_graph_updates()
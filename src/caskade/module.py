@@ -1,12 +1,16 @@
-from typing import Sequence, Mapping, Optional, Union, Any
+from typing import Optional, Union, Any
+from collections.abc import Sequence, Mapping
 from math import prod
+from operator import attrgetter, is_
+from types import MappingProxyType
 
 from torch import Tensor
 import torch
 
 from .base import Node
-from .param import Param
+from .param import Param, _TO_VALID, _FROM_VALID, _compute_dtype
 from .errors import (
+    GraphError,
     ActiveStateError,
     ParamConfigurationError,
     FillDynamicParamsTensorError,
@@ -14,6 +18,46 @@ from .errors import (
     FillDynamicParamsMappingError,
 )
 
+# Attribute value types which can never be a ``Node``, used to skip graph checks in ``__setattr__``
+_NON_NODE_TYPES = frozenset((int, float, bool, str, type(None), tuple, dict, Tensor))
+
+_get_dynamic = attrgetter("_dynamic")
+_get_valid = attrgetter("_valid")
+
+
+# Classification of input params types as Tensor, Sequence or Mapping. The
+# common concrete types are listed up front, others are added when first seen
+_PARAMS_TYPES = {Tensor: Tensor, list: Sequence, tuple: Sequence, dict: Mapping}
+
+
+def _params_type(params: Any) -> Optional[type]:
+    """Classify the input params as a Tensor, Sequence or Mapping (None if
+    unsupported). The result is stored per concrete type so the abstract base
+    class checks only run the first time a type is seen."""
+    try:
+        return _PARAMS_TYPES[type(params)]
+    except KeyError:
+        pass
+    for params_type in (Tensor, Sequence, Mapping):
+        if isinstance(params, params_type):
+            break
+    else:
+        params_type = None
+    _PARAMS_TYPES[type(params)] = params_type
+    return params_type
+
+
+def _group_by_shape(params: tuple[Param]) -> tuple[tuple[tuple, tuple[Param]]]:
+    """Group consecutive params which share a shape, so that a flattened Tensor
+    input can be split for the whole group with a single view."""
+    groups = []
+    for param in params:
+        if groups and param._shape is not None and groups[-1][0] == param._shape:
+            groups[-1][1].append(param)
+        else:
+            groups.append((param._shape, [param]))
+    return tuple((shape, tuple(group)) for shape, group in groups)
+
 
 class Module(Node):
     """
@@ -60,25 +104,38 @@ class Module(Node):
     """
 
     _module_names = set()
-    graphviz_types = {"module": {"style": "solid", "color": "black", "shape": "ellipse"}}
+    graphviz_types = MappingProxyType(
+        {"module": MappingProxyType({"style": "solid", "color": "black", "shape": "ellipse"})}
+    )
 
     def __init__(self, name: Optional[str] = None):
         super().__init__(name=name)
         self.dynamic_params = ()
         self.pointer_params = ()
+        self._dynamic_groups = ()
+        self._param_children = {}
+        self._valid_pack_cache = None
         self._type = "module"
         self.valid_context = False
 
     def update_graph(self):
         """Maintain a tuple of dynamic and live parameters at all points lower
         in the DAG."""
-        self.dynamic_params = tuple(self.topological_ordering("dynamic"))
-        self.pointer_params = tuple(self.topological_ordering("pointer"))
-        self.local_dynamic_params = tuple(
-            p for p in self.children.values() if isinstance(p, Param) and p.dynamic
+        # Kept current even while updates are deferred, ``__setattr__`` relies on it
+        self._param_children = dict(
+            (key, child) for key, child in self.children.items() if isinstance(child, Param)
         )
+        if self._defer_graph_update():
+            return
+        # Walk the graph once and split the ordering by node type
+        ordering = self.topological_ordering()
+        self.dynamic_params = tuple(n for n in ordering if n._type == "dynamic")
+        self.pointer_params = tuple(n for n in ordering if n._type == "pointer")
+        self.local_dynamic_params = tuple(filter(_get_dynamic, self._param_children.values()))
+        self._dynamic_groups = _group_by_shape(self.dynamic_params)
+        self._local_dynamic_groups = _group_by_shape(self.local_dynamic_params)
         self.dynamic_modules = dict(
-            (m.name, m) for m in self.topological_ordering("module") if m.dynamic
+            (m.name, m) for m in ordering if m._type == "module" and m.dynamic
         )
         super().update_graph()
 
@@ -87,6 +144,14 @@ class Module(Node):
         """Return True if the module has dynamic parameters"""
         return self.local_dynamic_params != ()
 
+    def _check_graph_updated(self, action: str):
+        """Raise if graph updates are deferred by ``BatchGraphUpdates``, the
+        dynamic params tuples are stale until the deferred updates run."""
+        if Node._graph_batch_depth > 0:
+            raise GraphError(
+                f"Cannot {action} of {self.name} inside BatchGraphUpdates, graph updates are deferred"
+            )
+
     def fill_params(self, params: Union[Tensor, Sequence, Mapping], local=False):
         """
         Fill the dynamic parameters of the module with the input values from
@@ -110,63 +175,89 @@ class Module(Node):
         """
         if not self.active:
             raise ActiveStateError("Module must be active to fill params")
+        self._check_graph_updated("fill params")
 
         if self.valid_context and not local:
             params = self.from_valid(params)
 
         dynamic_params = self.local_dynamic_params if local else self.dynamic_params
 
-        if isinstance(params, Tensor):
-            # check for batch dimension
-            batch = len(params.shape) > 1
-            B = tuple(params.shape[:-1]) if batch else ()
-            pos = 0
-            for param in dynamic_params:
-                if not isinstance(param.shape, tuple):
-                    raise ParamConfigurationError(
-                        f"Param {param.name} has no shape. dynamic parameters must have a shape to use Tensor input."
-                    )
-                # Handle scalar parameters
-                size = max(1, prod(param.shape))
-                try:
-                    param._value = params[..., pos : pos + size].view(B + param.shape)
-                except (RuntimeError, IndexError):
-                    raise FillDynamicParamsTensorError(self.name, params, dynamic_params)
-
-                pos += size
-            if pos != params.shape[-1]:
+        fill_params = self._FILL_PARAMS.get(_params_type(params))
+        if fill_params is None:
+            raise TypeError(
+                f"Input params type {type(params)} not supported. Should be Tensor, Sequence, or Mapping."
+            )
+        fill_params(self, params, dynamic_params, local)
+
+    def _fill_params_tensor(self, params: Tensor, dynamic_params: tuple[Param], local: bool):
+        groups = self._local_dynamic_groups if local else self._dynamic_groups
+        # check for batch dimension
+        batch = len(params.shape) > 1
+        B = tuple(params.shape[:-1]) if batch else ()
+        pos = 0
+        # Consecutive params with the same shape are filled with one view
+        for shape, group in groups:
+            if not isinstance(shape, tuple):
+                raise ParamConfigurationError(
+                    f"Param {group[0].name} has no shape. dynamic parameters must have a shape to use Tensor input."
+                )
+            # Handle scalar parameters
+            size = max(1, prod(shape)) * len(group)
+            try:
+                if len(group) == 1:
+                    group[0]._value = params[..., pos : pos + size].view(B + shape)
+                elif params.requires_grad:
+                    # unbind returns multi-output views which autograd does not allow
+                    # to be modified in place, so view each param on its own here
+                    param_size = size // len(group)
+                    for i, param in enumerate(group):
+                        start = pos + i * param_size
+                        param._value = params[..., start : start + param_size].view(B + shape)
+                else:
+                    values = params[..., pos : pos + size].view(B + (len(group),) + shape)
+                    for param, value in zip(group, values.unbind(len(B))):
+                        param._value = value
+            except (RuntimeError, IndexError):
                 raise FillDynamicParamsTensorError(self.name, params, dynamic_params)
-        elif isinstance(params, Sequence):
-            if len(params) == len(dynamic_params):
-                for param, value in zip(dynamic_params, params):
-                    param._value = value
-            elif len(params) == len(self.dynamic_modules):
-                for module, value in zip(self.dynamic_modules.values(), params):
-                    module.fill_params(value, local=True)
+
+            pos += size
+        if pos != params.shape[-1]:
+            raise FillDynamicParamsTensorError(self.name, params, dynamic_params)
+
+    def _fill_params_sequence(self, params: Sequence, dynamic_params: tuple[Param], local: bool):
+        if len(params) == len(dynamic_params):
+            for param, value in zip(dynamic_params, params):
+                param._value = value
+        elif len(params) == len(self.dynamic_modules):
+            for module, value in zip(self.dynamic_modules.values(), params):
+                module.fill_params(value, local=True)
+        else:
+            raise FillDynamicParamsSequenceError(
+                self.name, params, dynamic_params, self.dynamic_modules
+            )
+
+    def _fill_params_mapping(self, params: Mapping, dynamic_params: tuple[Param], local: bool):
+        for key in params:
+            if key in self.dynamic_modules:
+                self.dynamic_modules[key].fill_params(params[key], local=True)
+            elif key in self.children and self[key].dynamic:
+                self[key]._value = params[key]
             else:
-                raise FillDynamicParamsSequenceError(
-                    self.name, params, dynamic_params, self.dynamic_modules
+                raise FillDynamicParamsMappingError(
+                    self.name, self.children, self.dynamic_modules, missing_key=key
                 )
-        elif isinstance(params, Mapping):
-            for key in params:
-                if key in self.dynamic_modules:
-                    self.dynamic_modules[key].fill_params(params[key], local=True)
-                elif key in self.children and self[key].dynamic:
-                    self[key]._value = params[key]
-                else:
+        if not local:
+            for param in dynamic_params:
+                if param._value is None:
                     raise FillDynamicParamsMappingError(
-                        self.name, self.children, self.dynamic_modules, missing_key=key
+                        self.name, self.children, self.dynamic_modules, missing_param=param
                     )
-            if not local:
-                for param in dynamic_params:
-                    if param._value is None:
-                        raise FillDynamicParamsMappingError(
-                            self.name, self.children, self.dynamic_modules, missing_param=param
-                        )
-        else:
-            raise TypeError(
-                f"Input params type {type(params)} not supported. Should be Tensor, Sequence, or Mapping."
-            )
+
+    _FILL_PARAMS = {
+        Tensor: _fill_params_tensor,
+        Sequence: _fill_params_sequence,
+        Mapping: _fill_params_mapping,
+    }
 
     def clear_params(self):
         """Set all dynamic parameters to None and live parameters to LiveParam.
@@ -186,101 +277,160 @@ class Module(Node):
         """
         kwargs = {}
         for key in keys:
-            if key in self.children and isinstance(self[key], Param):
-                kwargs[key] = self[key].value
+            if key in self._param_children:
+                kwargs[key] = self._param_children[key].value
         return kwargs
 
     def to_valid(self, params: Union[Tensor, Sequence, Mapping], local=False):
         """Convert input params to valid params."""
-        dynamic_params = self.local_dynamic_params if local else self.dynamic_params
-        if isinstance(params, Tensor):
-            valid_params = torch.zeros_like(params)
-            batch = len(params.shape) > 1
-            B = tuple(params.shape[:-1]) if batch else ()
-            pos = 0
-            for param in dynamic_params:
-                size = max(1, prod(param.shape))  # Handle scalar parameters
-                return_shape = params[..., pos : pos + size].shape
-                valid_params[..., pos : pos + size] = param.to_valid(
-                    params[..., pos : pos + size].view(B + param.shape)
-                ).view(return_shape)
-                pos += size
-        elif isinstance(params, Sequence):
-            valid_params = []
-            if len(params) == len(dynamic_params):
-                for param, value in zip(dynamic_params, params):
-                    valid_params.append(param.to_valid(value))
-            elif len(params) == len(self.dynamic_modules):
-                for module, value in zip(self.dynamic_modules.values(), params):
-                    valid_params.append(module.to_valid(value, local=True))
-            else:
-                raise FillDynamicParamsSequenceError(
-                    self.name, params, dynamic_params, self.dynamic_modules
-                )
-        elif isinstance(params, Mapping):
-            valid_params = {}
-            for key in params:
-                if key in self.dynamic_modules:
-                    valid_params[key] = self.dynamic_modules[key].to_valid(params[key], local=True)
-                elif key in self.children and self[key].dynamic:
-                    valid_params[key] = self[key].to_valid(params[key])
-                else:
-                    raise FillDynamicParamsMappingError(
-                        self.name, self.children, self.dynamic_modules, missing_key=key
-                    )
-        else:
-            raise TypeError(
-                f"Input params type {type(params)} not supported. Should be Tensor, Sequence, or Mapping."
-            )
-        return valid_params
+        return self._transform_params(params, "to_valid", local)
 
     def from_valid(self, valid_params: Union[Tensor, Sequence, Mapping], local=False):
         """Convert valid params to input params."""
-
+        return self._transform_params(valid_params, "from_valid", local)
+
+    def _transform_params(self, params, transform: str, local: bool):
+        """Apply the ``to_valid`` or ``from_valid`` transform of each dynamic
+        parameter to the input params, keeping the layout of the input."""
+        self._check_graph_updated(f"apply {transform} to params")
+        transform_params = self._TRANSFORM_PARAMS.get(_params_type(params))
+        if transform_params is None:
+            raise TypeError(
+                f"Input params type {type(params)} not supported. Should be Tensor, Sequence, or Mapping."
+            )
         dynamic_params = self.local_dynamic_params if local else self.dynamic_params
-
-        if isinstance(valid_params, Tensor):
-            params = torch.zeros_like(valid_params)
-            batch = len(valid_params.shape) > 1
-            B = tuple(params.shape[:-1]) if batch else ()
-            pos = 0
-            for param in dynamic_params:
-                size = max(1, prod(param.shape))
-                return_shape = valid_params[..., pos : pos + size].shape
-                params[..., pos : pos + size] = param.from_valid(
-                    valid_params[..., pos : pos + size].view(B + param.shape)
-                ).view(return_shape)
-                pos += size
-        elif isinstance(valid_params, Sequence):
-            params = []
-            if len(valid_params) == len(dynamic_params):
-                for param, value in zip(dynamic_params, valid_params):
-                    params.append(param.from_valid(value))
-            elif len(valid_params) == len(self.dynamic_modules):
-                for module, value in zip(self.dynamic_modules.values(), valid_params):
-                    params.append(module.from_valid(value, local=True))
-            else:
-                raise FillDynamicParamsSequenceError(
-                    self.name, valid_params, dynamic_params, self.dynamic_modules
+        return transform_params(self, params, transform, dynamic_params)
+
+    def _pack_valid(self, params: Tensor, dynamic_params: tuple[Param]) -> tuple:
+        """Collect the valid transforms of the dynamic params as runs of a
+        flattened params Tensor, each applied with one call on a slice.
+        Consecutive scalar params with the same valid kind share a run, array
+        params get a run of their own so their bounds are not broadcast.
+        Returns the expected length of the flattened Tensor and the runs. The
+        result is reused until a param's valid range changes."""
+        for param in dynamic_params:
+            param._update_valid_args()
+        valids = tuple(map(_get_valid, dynamic_params))
+        cache = self._valid_pack_cache
+        if (
+            cache is not None
+            and cache[0] is dynamic_params
+            and cache[1] == (params.dtype, params.device)
+            and all(map(is_, cache[2], valids))
+        ):
+            return cache[3]
+
+        runs = []
+        pos = 0
+        for param in dynamic_params:
+            if not isinstance(param._shape, tuple):
+                raise ParamConfigurationError(
+                    f"Param {param.name} has no shape. dynamic parameters must have a shape to use Tensor input."
                 )
-        elif isinstance(valid_params, Mapping):
-            params = {}
-            for key in valid_params:
-                if key in self.dynamic_modules:
-                    params[key] = self.dynamic_modules[key].from_valid(
-                        valid_params[key], local=True
-                    )
-                elif key in self.children and self[key].dynamic:
-                    params[key] = self[key].from_valid(valid_params[key])
+            size = max(1, prod(param._shape))  # Handle scalar parameters
+            kind = param._valid_kind
+            if kind != 0:
+                last = runs[-1] if runs else None
+                if (
+                    last is not None
+                    and last[0] == kind
+                    and last[2] == pos
+                    and param._shape == ()
+                    and last[3][-1]._shape == ()
+                ):
+                    last[2] += size
+                    last[3].append(param)
                 else:
-                    raise FillDynamicParamsMappingError(
-                        self.name, self.children, self.dynamic_modules, missing_key=key
-                    )
+                    runs.append([kind, pos, pos + size, [param]])
+            pos += size
+
+        def pack(group, which):
+            # constants computed in the dtype the params would be transformed in
+            group_args = tuple(
+                param._get_valid_args(_compute_dtype(params.dtype, *param._valid))[which]
+                for param in group
+            )
+            if len(group) == 1:
+                # flatten array bounds to match the slice, scalar bounds broadcast as is
+                args = tuple(
+                    arg if arg.dim() == 0 else torch.broadcast_to(arg, group[0]._shape).reshape(-1)
+                    for arg in group_args[0]
+                )
+            else:
+                args = tuple(
+                    torch.cat(tuple(arg.reshape(-1) for arg in arg_group))
+                    for arg_group in zip(*group_args)
+                )
+            return tuple(arg.to(device=params.device, dtype=params.dtype) for arg in args)
+
+        packed = (
+            pos,
+            tuple(
+                (
+                    kind,
+                    slice(start, stop),
+                    pack(group, 0),
+                    pack(group, 1),
+                )
+                for kind, start, stop, group in runs
+            ),
+        )
+        self._valid_pack_cache = (dynamic_params, (params.dtype, params.device), valids, packed)
+        return packed
+
+    def _transform_params_tensor(
+        self, params: Tensor, transform: str, dynamic_params: tuple[Param]
+    ) -> Tensor:
+        # One elementwise transform per run of params rather than one per param
+        size, runs = self._pack_valid(params, dynamic_params)
+        if params.dim() == 0 or params.shape[-1] != size:
+            raise FillDynamicParamsTensorError(self.name, params, dynamic_params)
+        from_valid = transform == "from_valid"
+        functions = _FROM_VALID if from_valid else _TO_VALID
+        transformed = params.clone()
+        for kind, index, to_args, from_args in runs:
+            args = from_args if from_valid else to_args
+            transformed[..., index] = functions[kind](params[..., index], *args)
+        return transformed
+
+    def _transform_params_sequence(
+        self, params: Sequence, transform: str, dynamic_params: tuple[Param]
+    ) -> list:
+        transformed = []
+        if len(params) == len(dynamic_params):
+            for param, value in zip(dynamic_params, params):
+                transformed.append(getattr(param, transform)(value))
+        elif len(params) == len(self.dynamic_modules):
+            for module, value in zip(self.dynamic_modules.values(), params):
+                transformed.append(getattr(module, transform)(value, local=True))
         else:
-            raise TypeError(
-                f"Input params type {type(valid_params)} not supported. Should be Tensor, Sequence or Mapping."
+            raise FillDynamicParamsSequenceError(
+                self.name, params, dynamic_params, self.dynamic_modules
             )
-        return params
+        return transformed
+
+    def _transform_params_mapping(
+        self, params: Mapping, transform: str, dynamic_params: tuple[Param]
+    ) -> dict:
+        transformed = {}
+        for key in params:
+            if key in self.dynamic_modules:
+                transformed[key] = getattr(self.dynamic_modules[key], transform)(
+                    params[key], local=True
+                )
+            elif key in self.children and self[key].dynamic:
+                transformed[key] = getattr(self[key], transform)(params[key])
+            else:
+                raise FillDynamicParamsMappingError(
+                    self.name, self.children, self.dynamic_modules, missing_key=key
+                )
+        return transformed
+
+    _TRANSFORM_PARAMS = {
+        Tensor: _transform_params_tensor,
+        Sequence: _transform_params_sequence,
+        Mapping: _transform_params_mapping,
+    }
 
     @property
     def _name(self) -> str:
@@ -306,10 +456,10 @@ class Module(Node):
     def __setattr__(self, key: str, value: Any):
         """Intercept attribute setting to update parameters and graph links."""
         try:
-            if key in self.children and isinstance(self[key], Param):
-                self[key].value = value
+            if key in self._param_children:
+                self._param_children[key].value = value
                 return
-            if isinstance(value, Node):
+            if type(value) not in _NON_NODE_TYPES and isinstance(value, Node):
                 self.link(key, value)
         except AttributeError:
             pass
@@ -1,4 +1,5 @@
-from typing import Optional, Union, Callable
+from typing import Optional, Union
+from types import MappingProxyType
 from warnings import warn
 
 import torch
@@ -10,6 +11,106 @@ from .errors import ParamConfigurationError, ParamTypeError, ActiveStateError
 from .warnings import InvalidValueWarning
 
 
+# Shared valid tuple for params without bounds
+_NO_VALID = (None, None)
+
+
+def _as_tensor(value) -> Tensor:
+    """``torch.as_tensor`` which skips the call when value is already a Tensor"""
+    return value if isinstance(value, Tensor) else torch.as_tensor(value)
+
+
+# Elementwise valid transforms, kept as plain functions of the value and the
+# bounds so they can be reused on packed bounds or wrapped by torch.compile.
+# The fullvalid pair is written about the midpoint of the range. The midpoint
+# is subtracted before scaling, which keeps full precision for narrow ranges
+# far from zero
+def _no_transform(value):
+    return value
+
+
+def _fullvalid_to(value, midpoint, scale):
+    return torch.tan((value - midpoint) * scale)
+
+
+def _fullvalid_from(value, midpoint, inv_scale):
+    return torch.atan(value) * inv_scale + midpoint
+
+
+def _cyclic_wrap(value, lo, valid_range):
+    return torch.remainder(value - lo, valid_range) + lo
+
+
+def _leftvalid_to(value, lo):
+    return value - 1.0 / (value - lo)
+
+
+def _leftvalid_from(value, lo):
+    # the square is a fresh tensor not saved for backward, so add in place
+    offset = value - lo
+    return (value + lo + torch.sqrt((offset * offset).add_(4))) * 0.5
+
+
+def _rightvalid_to(value, hi):
+    return value + 1.0 / (hi - value)
+
+
+def _rightvalid_from(value, hi):
+    offset = value - hi
+    return (value + hi - torch.sqrt((offset * offset).add_(4))) * 0.5
+
+
+# Transforms indexed by Param._valid_kind: base, full, cyclic, left, right
+_TO_VALID = (_no_transform, _fullvalid_to, _cyclic_wrap, _leftvalid_to, _rightvalid_to)
+_FROM_VALID = (_no_transform, _fullvalid_from, _cyclic_wrap, _leftvalid_from, _rightvalid_from)
+
+
+def _compute_dtype(dtype: torch.dtype, lo: Optional[Tensor], hi: Optional[Tensor]) -> torch.dtype:
+    """dtype the valid transform of a value with the given dtype runs in, the
+    promotion of the value and bound dtypes (floating point)."""
+    dtype = torch.promote_types(dtype, (lo if lo is not None else hi).dtype)
+    return dtype if dtype.is_floating_point else torch.get_default_dtype()
+
+
+def _valid_args(kind: int, lo: Optional[Tensor], hi: Optional[Tensor], dtype: torch.dtype) -> tuple:
+    """Constants passed to the to_valid and from_valid transforms of a valid
+    kind, computed from the bounds in the given dtype."""
+    if kind == 1:
+        lo = lo.to(dtype=dtype)
+        valid_range = hi.to(dtype=dtype) - lo
+        midpoint = lo + valid_range / 2
+        return (midpoint, pi / valid_range), (midpoint, valid_range / pi)
+    if kind == 2:
+        lo = lo.to(dtype=dtype)
+        args = (lo, hi.to(dtype=dtype) - lo)
+        return args, args
+    if kind == 3:
+        args = (lo.to(dtype=dtype),)
+        return args, args
+    if kind == 4:
+        args = (hi.to(dtype=dtype),)
+        return args, args
+    return (), ()
+
+
+def _bounds_version(lo: Optional[Tensor], hi: Optional[Tensor]) -> tuple:
+    """Version counters of the valid bounds, these change on in-place edits"""
+    return (None if lo is None else lo._version, None if hi is None else hi._version)
+
+
+def _any_outside(value: Tensor, lo: Optional[Tensor], hi: Optional[Tensor]) -> bool:
+    """Check if any element of value is below lo or above hi, a None bound is
+    not checked. Scalars are compared as python numbers."""
+    if value.dim() == 0 and (lo is None or lo.dim() == 0) and (hi is None or hi.dim() == 0):
+        value = value.item()
+        return (lo is not None and value < lo.item()) or (hi is not None and value > hi.item())
+    if lo is None:
+        return bool(torch.any(value > hi))
+    if hi is None:
+        return bool(torch.any(value < lo))
+    return bool(torch.any((value < lo) | (value > hi)))
+
+
 class Param(Node):
     """
     Node to represent a parameter in the graph.
@@ -49,11 +150,29 @@ class Param(Node):
         The units of the parameter. Defaults to None.
     """
 
-    graphviz_types = {
-        "static": {"style": "filled", "color": "lightgrey", "shape": "box"},
-        "dynamic": {"style": "solid", "color": "black", "shape": "box"},
-        "pointer": {"style": "filled", "color": "lightgrey", "shape": "cds"},
-    }
+    __slots__ = (
+        "_static",
+        "_dynamic",
+        "_pointer",
+        "_value",
+        "_shape",
+        "_pointer_func",
+        "_pointer_target",
+        "_cyclic",
+        "_valid",
+        "_valid_kind",
+        "_valid_version",
+        "_valid_args",
+        "units",
+    )
+
+    graphviz_types = MappingProxyType(
+        {
+            "static": MappingProxyType({"style": "filled", "color": "lightgrey", "shape": "box"}),
+            "dynamic": MappingProxyType({"style": "solid", "color": "black", "shape": "box"}),
+            "pointer": MappingProxyType({"style": "filled", "color": "lightgrey", "shape": "cds"}),
+        }
+    )
 
     def __init__(
         self,
@@ -65,34 +184,48 @@ class Param(Node):
         units: Optional[str] = None,
     ):
         super().__init__(name=name)
+        self._static = self._dynamic = self._pointer = False
+        self._cyclic = False
+        self._valid = _NO_VALID
+        self._valid_kind = 0
+        self._valid_version = (None, None)
+        self._valid_args = {}
         if value is None:
             if shape is None:
                 raise ParamConfigurationError("Either value or shape must be provided")
             if not isinstance(shape, tuple):
                 raise ParamConfigurationError("Shape must be a tuple")
             self.shape = shape
-        elif not isinstance(value, (Param, Callable)):
-            value = torch.as_tensor(value)
+        elif not (isinstance(value, Param) or callable(value)):
+            value = _as_tensor(value)
             if not (shape == () or shape is None or shape == value.shape):
                 raise ParamConfigurationError(
                     f"Shape {shape} does not match value shape {value.shape}"
                 )
         self.value = value
-        self.cyclic = cyclic
+        # valid is set right after, so the cyclic setter re-check is not needed here
+        self._cyclic = cyclic
         self.valid = valid
         self.units = units
 
+    def _set_type(self, param_type: str):
+        # Cache the type checks as flags, these are read on every value access
+        self._type = param_type
+        self._static = param_type == "static"
+        self._dynamic = param_type == "dynamic"
+        self._pointer = param_type == "pointer"
+
     @property
     def dynamic(self) -> bool:
-        return self._type == "dynamic"
+        return self._dynamic
 
     @property
     def pointer(self) -> bool:
-        return self._type == "pointer"
+        return self._pointer
 
     @property
     def static(self) -> bool:
-        return self._type == "static"
+        return self._static
 
     @property
     def shape(self) -> tuple:
@@ -100,17 +233,23 @@ class Param(Node):
 
     @shape.setter
     def shape(self, shape):
-        if self.pointer:
+        if self._pointer:
             raise ParamTypeError("Cannot set shape of parameter with type 'pointer'")
         self._shape = shape
+        self.update_graph()
 
     @property
     def value(self) -> Union[Tensor, None]:
-        if self.pointer and self._value is None:
-            if self.active:
-                self._value = self._pointer_func(self)
+        # static, dynamic and memoized pointer values are all held in _value
+        if self._pointer and self._value is None:
+            # Param to Param pointers read the target directly
+            if self._pointer_target is not None:
+                value = self._pointer_target.value
             else:
-                return self._pointer_func(self)
+                value = self._pointer_func(self)
+            if self._active:
+                self._value = value
+            return value
         return self._value
 
     @value.setter
@@ -119,37 +258,39 @@ class Param(Node):
         if self.active:
             raise ActiveStateError(f"Cannot set value of parameter {self.name} while active")
 
-        # unlink if pointer to avoid floating references
-        if self.pointer:
-            for child in tuple(self.children.values()):
-                self.unlink(child)
-
-        if value is None:
-            self._type = "dynamic"
-            self._pointer_func = None
-            self._value = None
-        elif isinstance(value, Param):
-            self._type = "pointer"
-            self.link(str(id(value)), value)
-            self._pointer_func = lambda p: p[str(id(value))].value
-            self._shape = None
-            self._value = None
-        elif callable(value):
-            self._type = "pointer"
-            self._shape = None
-            self._pointer_func = value
-            self._value = None
-        else:
-            self._type = "static"
-            value = torch.as_tensor(value)
-            self.shape = value.shape
-            self._value = value
-            try:
-                self.valid = self._valid  # re-check valid range
-            except AttributeError:
-                pass
-
-        self.update_graph()
+        # Relinking a pointer can touch the graph several times, update parents once at the end
+        with self._batch_graph_update():
+            # unlink if pointer to avoid floating references
+            if self._pointer:
+                for child in tuple(self.children.values()):
+                    self.unlink(child)
+
+            if value is None:
+                self._set_type("dynamic")
+                self._pointer_func = None
+                self._pointer_target = None
+                self._value = None
+            elif isinstance(value, Param):
+                self._set_type("pointer")
+                self.link(id(value), value)
+                self._pointer_func = None
+                self._pointer_target = value
+                self._shape = None
+                self._value = None
+            elif callable(value):
+                self._set_type("pointer")
+                self._shape = None
+                self._pointer_func = value
+                self._pointer_target = None
+                self._value = None
+            else:
+                self._set_type("static")
+                self._pointer_func = None
+                self._pointer_target = None
+                value = _as_tensor(value)
+                self._shape = value.shape
+                self._value = value
+                self._check_valid_value()
 
     def to(self, device=None, dtype=None):
         """
@@ -163,12 +304,18 @@ class Param(Node):
             The desired data type. Defaults to None.
         """
         super().to(device=device, dtype=dtype)
-        if self.static:
+        if self._static:
             self._value = self._value.to(device=device, dtype=dtype)
-        if self.valid[0] is not None:
-            self.valid = (self.valid[0].to(device=device, dtype=dtype), self.valid[1])
-        if self.valid[1] is not None:
-            self.valid = (self.valid[0], self.valid[1].to(device=device, dtype=dtype))
+        # Moving the bounds does not change the valid kind, skip the setter checks
+        lo, hi = self._valid
+        if lo is not None:
+            lo = lo.to(device=device, dtype=dtype)
+        if hi is not None:
+            hi = hi.to(device=device, dtype=dtype)
+        # Tensor.to returns the same tensor when nothing changes, keep the
+        # current constants (and the valid tuple packed by modules) in that case
+        if lo is not self._valid[0] or hi is not self._valid[1]:
+            self._set_valid_tensors(lo, hi)
 
         return self
 
@@ -179,10 +326,7 @@ class Param(Node):
     @cyclic.setter
     def cyclic(self, cyclic: bool):
         self._cyclic = cyclic
-        try:
-            self.valid = self._valid
-        except AttributeError:
-            pass
+        self.valid = self._valid
 
     @property
     def valid(self):
@@ -190,99 +334,95 @@ class Param(Node):
 
     @valid.setter
     def valid(self, valid: tuple[Union[Tensor, float, int, None]]):
+        # Most params are unbounded, nothing to do if they already are
+        if (valid is None or valid is _NO_VALID) and self._valid is _NO_VALID and not self._cyclic:
+            return
         if valid is None:
-            valid = (None, None)
+            valid = _NO_VALID
 
         if not isinstance(valid, tuple):
             raise ParamConfigurationError("Valid must be a tuple")
         if len(valid) != 2:
             raise ParamConfigurationError("Valid must be a tuple of length 2")
 
-        if valid == (None, None):
-            if self.cyclic:
+        if valid == _NO_VALID:
+            if self._cyclic:
                 raise ParamConfigurationError("Cannot set valid to None for cyclic parameter")
-            self.to_valid = self._to_valid_base
-            self.from_valid = self._from_valid_base
+            kind = 0
         elif valid[0] is None:
-            if self.cyclic:
+            if self._cyclic:
                 raise ParamConfigurationError("Cannot set left valid to None for cyclic parameter")
-            self.to_valid = self._to_valid_rightvalid
-            self.from_valid = self._from_valid_rightvalid
-            valid = (None, torch.as_tensor(valid[1]))
-            if self.static and torch.any(self.value > valid[1]):
-                warn(InvalidValueWarning(self.name, self.value, valid))
+            kind = 4
+            valid = (None, _as_tensor(valid[1]))
         elif valid[1] is None:
-            if self.cyclic:
+            if self._cyclic:
                 raise ParamConfigurationError("Cannot set right valid to None for cyclic parameter")
-            self.to_valid = self._to_valid_leftvalid
-            self.from_valid = self._from_valid_leftvalid
-            valid = (torch.as_tensor(valid[0]), None)
-            if self.static and torch.any(self.value < valid[0]):
-                warn(InvalidValueWarning(self.name, self.value, valid))
+            kind = 3
+            valid = (_as_tensor(valid[0]), None)
         else:
-            if self.cyclic:
-                self.to_valid = self._to_valid_cyclic
-                self.from_valid = self._from_valid_cyclic
+            kind = 2 if self._cyclic else 1
+            valid = (_as_tensor(valid[0]), _as_tensor(valid[1]))
+            if valid[0].dim() == 0 and valid[1].dim() == 0:
+                # scalar bounds, compare as python numbers
+                bad_range = valid[0].item() >= valid[1].item()
             else:
-                self.to_valid = self._to_valid_fullvalid
-                self.from_valid = self._from_valid_fullvalid
-            valid = (torch.as_tensor(valid[0]), torch.as_tensor(valid[1]))
-            if torch.any(valid[0] >= valid[1]):
+                bad_range = torch.any(valid[0] >= valid[1])
+            if bad_range:
                 raise ParamConfigurationError("Valid range (valid[1] - valid[0]) must be positive")
-            if (
-                self.static
-                and not self.cyclic
-                and (torch.any(self.value < valid[0]) or torch.any(self.value > valid[1]))
-            ):
-                warn(InvalidValueWarning(self.name, self.value, valid))
-
-        self._valid = valid
 
-    def _to_valid_base(self, value):
-        if self.pointer:
+        self._valid_kind = kind
+        self._set_valid_tensors(*valid)
+        if self._static:
+            self._check_valid_value()
+
+    def _check_valid_value(self):
+        """Warn if the static value falls outside the current valid range."""
+        # No bounds, or cyclic where every value maps into the range
+        if self._valid_kind == 0 or self._valid_kind == 2:
+            return
+        if _any_outside(self._value, *self._valid):
+            warn(InvalidValueWarning(self.name, self._value, self._valid))
+
+    def _set_valid_tensors(self, lo: Optional[Tensor], hi: Optional[Tensor]):
+        """Store already checked valid bounds, the valid kind is left as is.
+        Also resets the transform constants computed from the old bounds."""
+        self._valid = _NO_VALID if lo is None and hi is None else (lo, hi)
+        self._valid_version = _bounds_version(lo, hi)
+        self._valid_args = {}
+
+    def _update_valid_args(self):
+        """Recompute the transform constants if a bound was edited in place."""
+        if _bounds_version(*self._valid) != self._valid_version:
+            self._set_valid_tensors(*self._valid)
+
+    def _get_valid_args(self, dtype: torch.dtype) -> tuple:
+        """The (to_valid, from_valid) transform constants computed in dtype.
+        These are cached per dtype, so float64 values are not transformed
+        with constants rounded to the (often float32) dtype of the bounds."""
+        args = self._valid_args.get(dtype)
+        if args is None:
+            args = self._valid_args[dtype] = _valid_args(self._valid_kind, *self._valid, dtype)
+        return args
+
+    def to_valid(self, value):
+        if self._pointer:
             raise ParamTypeError("Cannot apply valid transformation to pointer parameter")
-        return value
-
-    def _to_valid_fullvalid(self, value):
-        value = self._to_valid_base(value)
-        return torch.tan((value - self.valid[0]) * pi / (self.valid[1] - self.valid[0]) - pi / 2)
-
-    def _to_valid_cyclic(self, value):
-        value = self._to_valid_base(value)
-        return (value - self.valid[0]) % (self.valid[1] - self.valid[0]) + self.valid[0]
-
-    def _to_valid_leftvalid(self, value):
-        value = self._to_valid_base(value)
-        return value - 1.0 / (value - self.valid[0])
-
-    def _to_valid_rightvalid(self, value):
-        value = self._to_valid_base(value)
-        return value + 1.0 / (self.valid[1] - value)
-
-    def _from_valid_base(self, value):
-        if self.pointer:
+        if self._valid_kind == 0:
+            return value
+        self._update_valid_args()
+        value = _as_tensor(value)
+        to_args, _ = self._get_valid_args(_compute_dtype(value.dtype, *self._valid))
+        return _TO_VALID[self._valid_kind](value, *to_args)
+
+    def from_valid(self, value):
+        if self._pointer:
             raise ParamTypeError("Cannot apply valid transformation to pointer parameter")
-        return value
-
-    def _from_valid_fullvalid(self, value):
-        value = self._from_valid_base(value)
-        value = (torch.atan(value) + pi / 2) * (self.valid[1] - self.valid[0]) / pi + self.valid[0]
-        return value
-
-    def _from_valid_cyclic(self, value):
-        value = self._from_valid_base(value)
-        value = (value - self.valid[0]) % (self.valid[1] - self.valid[0]) + self.valid[0]
-        return value
-
-    def _from_valid_leftvalid(self, value):
-        value = self._from_valid_base(value)
-        value = (value + self.valid[0] + ((value - self.valid[0]) ** 2 + 4).sqrt()) / 2
-        return value
-
-    def _from_valid_rightvalid(self, value):
-        value = self._from_valid_base(value)
-        value = (value + self.valid[1] - ((value - self.valid[1]) ** 2 + 4).sqrt()) / 2
-        return value
+        if self._valid_kind == 0:
+            return value
+        self._update_valid_args()
+        value = _as_tensor(value)
+        _, from_args = self._get_valid_args(_compute_dtype(value.dtype, *self._valid))
+        return _FROM_VALID[self._valid_kind](value, *from_args)
 
     def __repr__(self):
         return self.name
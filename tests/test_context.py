@@ -1,6 +1,16 @@
-from caskade import Module, Param, forward, ActiveContext, OverrideParam
+from caskade import (
+    Module,
+    Param,
+    forward,
+    ActiveContext,
+    OverrideParam,
+    BatchGraphUpdates,
+    GraphError,
+)
 import torch
 
+import pytest
+
 
 def test_active_context():
 
@@ -65,3 +75,47 @@ def test_override_param():
     testsim = TestSim()
     assert testsim.testfunc(torch.tensor([5.0])).item() == 27.0
     assert testsim.a.value.item() == 3.0
+
+
+def test_batch_graph_updates():
+
+    class Inner(Module):
+        def __init__(self, name):
+            super().__init__(name)
+            self.x = Param("x")
+            self.y = Param("y", 1.0)
+
+    class Outer(Module):
+        def __init__(self):
+            super().__init__("batch_outer")
+            self.inner = Inner("batch_inner")
+            self.z = Param("z", shape=(2,))
+
+        @forward
+        def test(self, z):
+            return z.sum()
+
+    with BatchGraphUpdates():
+        sim = Outer()
+        sim.inner.y = None
+        sim.z = sim.inner.x
+        # Param value routing still works while updates are deferred
+        sim.inner.y = 2.0
+        # Params can not be filled until the graph is updated
+        with pytest.raises(GraphError):
+            sim.test(torch.ones(1))
+        # Neither can they be transformed to or from valid
+        sim.inner.y = None
+        sim.inner.y.valid = (0, 1)
+        with pytest.raises(GraphError):
+            sim.to_valid([torch.tensor(0.5), torch.tensor(0.5)])
+        with pytest.raises(GraphError):
+            sim.from_valid(torch.ones(2))
+        sim.inner.y.valid = None
+        sim.inner.y = 2.0
+    assert sim.dynamic_params == (sim.inner.x,)
+    assert sim.pointer_params == (sim.z,)
+    assert sim.inner.dynamic_params == (sim.inner.x,)
+    assert sim.inner.y.value.item() == 2.0
+    assert tuple(sim.dynamic_modules) == ("batch_inner",)
+    assert sim.test(torch.ones(1)).item() == 1.0
@@ -1,6 +1,14 @@
 import torch
 
-from caskade import Module, Param, ActiveStateError, forward
+from caskade import (
+    Module,
+    Param,
+    ActiveContext,
+    ActiveStateError,
+    FillDynamicParamsTensorError,
+    ValidContext,
+    forward,
+)
 
 import pytest
 
@@ -98,3 +106,120 @@ def test_shared_param():
 
     c1 = CombineModules("c1", m1, m2)
     assert c1.big_test([torch.tensor(1.0)]).item() == 4.0, "Shared parameter not working"
+
+
+def test_fill_params_reuse_tensor():
+
+    class TestSim(Module):
+        def __init__(self):
+            super().__init__("fill_reuse")
+            self.a = Param("a")
+            self.b = Param("b")
+            self.c = Param("c", shape=(2,))
+
+        @forward
+        def test(self, a, b, c):
+            return a + b + c.sum()
+
+    sim = TestSim()
+    params = torch.tensor([1.0, 2.0, 3.0, 4.0])
+    assert sim.test(params).item() == 10.0
+    # Same tensor updated in place
+    params[0] = 5.0
+    assert sim.test(params).item() == 14.0
+    # New tensor with the same values
+    assert sim.test(params.clone()).item() == 14.0
+    # Batched input after flat input
+    assert sim.test(params.repeat(3, 1)).shape == (3,)
+
+    with ActiveContext(sim):
+        sim.fill_params(params)
+        assert sim.test().item() == 14.0
+        # Same tensor object with new storage
+        params.data = torch.ones(4)
+        sim.fill_params(params)
+        assert sim.test().item() == 4.0
+
+
+def test_fill_params_inplace_with_grad():
+
+    class TestSim(Module):
+        def __init__(self):
+            super().__init__("fill_inplace")
+            self.a = Param("a", valid=(0, 1))
+            self.b = Param("b", valid=(0, 1))
+
+        @forward
+        def test(self, a, b):
+            a.add_(1.0)
+            return a + b
+
+    sim = TestSim()
+    params = torch.zeros(2, requires_grad=True)
+    # Inside a ValidContext the filled values come from a tensor which requires grad
+    with ValidContext(sim):
+        result = sim.test(params)
+    assert result.item() == 2.0
+    result.backward()
+    assert params.grad is not None
+
+
+def test_to_valid_tensor_matches_params():
+
+    class TestSim(Module):
+        def __init__(self):
+            super().__init__("valid_pack")
+            self.a = Param("a", valid=(0, 1))
+            self.b = Param("b", shape=(2,))
+            self.c = Param("c", shape=(2,), valid=(torch.tensor([0.0, 1.0]), None))
+            self.d = Param("d", valid=(None, 2))
+            self.e = Param("e", valid=(0, 2), cyclic=True)
+            self.f = Param("f", valid=(-1.0, 1.0))
+            self.g = Param("g", valid=(-2, 2))
+
+    sim = TestSim()
+    params = torch.tensor([0.5, 3.0, 4.0, 0.5, 1.5, 1.0, 3.0, -0.5, 1.5])
+    dynamic_params = (sim.a, sim.b, sim.c, sim.d, sim.e, sim.f, sim.g)
+    values = (params[0], params[1:3], params[3:5], params[5], params[6], params[7], params[8])
+    expected = torch.cat(tuple(p.to_valid(v).reshape(-1) for p, v in zip(dynamic_params, values)))
+    valid_params = sim.to_valid(params)
+    assert torch.allclose(valid_params, expected)
+    # cyclic e wraps back into (0, 2)
+    roundtrip = params.clone()
+    roundtrip[6] = 1.0
+    assert torch.allclose(sim.from_valid(valid_params), roundtrip)
+    # Batched input
+    assert torch.allclose(sim.to_valid(params.repeat(3, 1)), expected.repeat(3, 1))
+    # float64 params are transformed in float64
+    valid_params = sim.to_valid(params.double())
+    assert valid_params.dtype == torch.float64
+    assert torch.allclose(sim.from_valid(valid_params), roundtrip.double(), rtol=0, atol=1e-12)
+    # Changing a valid range is picked up
+    sim.a.valid = (0, 2)
+    assert torch.allclose(sim.to_valid(params)[0], sim.a.to_valid(params[0]))
+    # Also when a bound is edited in place
+    sim.f.valid[1].mul_(2)
+    assert torch.allclose(sim.to_valid(params)[7], torch.tan((params[7] - 0.5) * torch.pi / 3))
+    # Wrong number of params, too few or too many
+    with pytest.raises(FillDynamicParamsTensorError):
+        sim.to_valid(params[:-1])
+    with pytest.raises(FillDynamicParamsTensorError):
+        sim.from_valid(torch.cat((params, params)))
+
+
+def test_pointer_relink_updates_module():
+    m = Module("relink")
+    m.a = Param("a", shape=(2,))
+    m.b = Param("b")
+    m.p = Param("p")
+    assert m.dynamic_params == (m.a, m.b, m.p)
+
+    m.p.value = m.a
+    assert m.dynamic_params == (m.a, m.b)
+    assert m.pointer_params == (m.p,)
+    m.p.value = m.b
+    assert tuple(m.p.children.values()) == (m.b,)
+    assert m.pointer_params == (m.p,)
+    m.p.value = None
+    assert m.dynamic_params == (m.a, m.b, m.p)
+    assert m.pointer_params == ()
@@ -96,6 +96,30 @@ def test_value_setter():
     assert p.value.item() == 4.0
 
 
+def test_valid_far_from_zero():
+    # narrow range far from zero, float32 precision must be kept
+    p = Param("test", valid=(5000.0, 5100.0))
+    x = torch.tensor([5000.01, 5000.5, 5050.0, 5099.9])
+    expected = torch.tan((x.double() - 5050.0) * torch.pi / 100.0)
+    assert torch.allclose(p.to_valid(x).double(), expected, rtol=1e-3)
+    assert torch.allclose(p.from_valid(p.to_valid(x)), x, rtol=0, atol=1e-2)
+
+
+def test_valid_float64_values():
+    # bounds from python numbers are float32, float64 values keep their precision
+    x = torch.linspace(0.11, 0.69, 7, dtype=torch.float64)
+    for valid, cyclic in (
+        ((0.1, 0.7), False),
+        ((0.1, 0.7), True),
+        ((0.1, None), False),
+        ((None, 0.7), False),
+    ):
+        p = Param("p", valid=valid, cyclic=cyclic)
+        y = p.to_valid(x)
+        assert y.dtype == torch.float64
+        assert torch.allclose(p.from_valid(y), x, rtol=0, atol=1e-12)
+
+
 def test_units():
     p = Param("test", units="m")
     assert p.units == "m"
@@ -162,3 +186,10 @@ def test_valid():
         p.valid = (0, None)
     with pytest.warns(InvalidValueWarning):
         p.valid = (None, -2)
+
+    # clearing valid, again for an already unbounded param
+    for _ in range(2):
+        p.valid = None
+        assert p.valid == (None, None)
+        assert p.to_valid(v) == v, "valid value should not change"
+        assert p.from_valid(v) == v, "valid value should not change"